@@ -0,0 +1,253 @@
+"""Микробенчмарки горячих путей игры.
+
+Запуск и сохранение результатов:
+    python benchmarks/bench_hot_paths.py run --output bench.json
+
+Сравнение с сохраненным базовым замером:
+    python benchmarks/bench_hot_paths.py compare benchmarks/baseline.json bench.json --threshold 0.25
+
+compare завершается с кодом 1, если какой-то замер медленнее базового
+больше чем на threshold (доля, 0.25 = 25%).
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import main  # noqa: E402  pylint: disable=wrong-import-position
+
+DEFAULT_REPEAT = 7
+DEFAULT_THRESHOLD = 0.25
+CHAT_ID = -100
+
+# Фиксированные руки с разными очками, чтобы compare_hands не уходил в свару
+SHOWDOWN_HANDS = [
+    [('6', '♥'), ('6', '♦'), ('6', '♣')],
+    [('A', '♥'), ('A', '♦'), ('7', '♣')],
+    [('10', '♠'), ('K', '♠'), ('9', '♦')],
+    [('8', '♣'), ('8', '♦'), ('J', '♥')],
+    [('7', '♥'), ('9', '♥'), ('Q', '♦')],
+    [('6', '♠'), ('7', '♦'), ('9', '♣')],
+]
+
+
+# Заглушки Telegram
+class FakeBot:
+    async def send_message(self, **kwargs):
+        return None
+
+
+class FakeChat:
+    def __init__(self, chat_id: int):
+        self.id = chat_id
+
+    async def send_message(self, text, **kwargs):
+        return None
+
+
+def make_update_and_context():
+    update = SimpleNamespace(effective_chat=FakeChat(CHAT_ID))
+    context = SimpleNamespace(bot=FakeBot())
+    return update, context
+
+
+def make_game(players: int = main.MAX_PLAYERS) -> main.Game:
+    game = main.Game()
+    game.chat_id = CHAT_ID
+    for user_id in range(1, players + 1):
+        game.add_player(main.Player(user_id, f"Player {user_id}"))
+    return game
+
+
+# Бенчмарки: каждая функция выполняет n операций и возвращает затраченное время
+def bench_get_hand_value(n: int) -> float:
+    rng = random.Random(42)
+    deck = [main.Card(rank, suit) for suit in main.Card.SUITS for rank in main.Card.RANKS]
+    players = []
+    for i in range(64):
+        player = main.Player(i, str(i))
+        player.cards = rng.sample(deck, 3)
+        players.append(player)
+
+    start = time.perf_counter()
+    for i in range(n):
+        players[i & 63].get_hand_value()
+    return time.perf_counter() - start
+
+
+def bench_deck_and_deal(n: int) -> float:
+    random.seed(42)
+    game = make_game()
+    players = list(game.players.values())
+
+    elapsed = 0.0
+    for _ in range(n):
+        for player in players:
+            player.cards.clear()
+            player.is_dark = False
+        start = time.perf_counter()
+        game.initialize_deck()
+        game.deal_cards()
+        elapsed += time.perf_counter() - start
+    return elapsed
+
+
+def bench_active_players(n: int) -> float:
+    game = make_game()
+    game.players[2].folded = True
+
+    start = time.perf_counter()
+    for _ in range(n):
+        game.active_players  # pylint: disable=pointless-statement
+    return time.perf_counter() - start
+
+
+def bench_next_turn(n: int) -> float:
+    game = make_game()
+    game.current_max_bet = main.ANTE_AMOUNT
+
+    start = time.perf_counter()
+    for _ in range(n):
+        game.next_turn()
+    return time.perf_counter() - start
+
+
+def _run_async(n: int, setup: Callable, handler: Callable) -> float:
+    update, context = make_update_and_context()
+
+    async def run() -> float:
+        elapsed = 0.0
+        for _ in range(n):
+            setup()
+            start = time.perf_counter()
+            await handler(update, context)
+            elapsed += time.perf_counter() - start
+        return elapsed
+
+    try:
+        return asyncio.run(run())
+    finally:
+        main.close_game(CHAT_ID)
+
+
+def bench_compare_hands(n: int) -> float:
+    def setup():
+        game = make_game()
+        game.state = main.GameState.COMPARING_HANDS
+        game.pot = 100
+        for player, hand in zip(game.players.values(), SHOWDOWN_HANDS):
+            player.cards = [main.Card(rank, suit) for rank, suit in hand]
+        main.open_game(CHAT_ID, game)
+
+    return _run_async(n, setup, main.compare_hands)
+
+
+def bench_send_bidding_options(n: int) -> float:
+    game = make_game()
+    game.state = main.GameState.BIDDING
+    game.current_max_bet = main.ANTE_AMOUNT
+    game.last_raiser = game.players[1]
+    game.players[2].is_dark = True
+    main.open_game(CHAT_ID, game)
+
+    def setup():
+        game.current_bidder_index += 1
+
+    return _run_async(n, setup, main.send_bidding_options)
+
+
+BENCHMARKS: Dict[str, tuple] = {
+    # имя: (функция, число операций в одном повторе)
+    "player.get_hand_value": (bench_get_hand_value, 50000),
+    "game.initialize_deck+deal_cards": (bench_deck_and_deal, 5000),
+    "game.active_players": (bench_active_players, 100000),
+    "game.next_turn": (bench_next_turn, 50000),
+    "compare_hands": (bench_compare_hands, 2000),
+    "send_bidding_options": (bench_send_bidding_options, 5000),
+}
+
+
+def run_benchmarks(repeat: int, only: List[str]) -> dict:
+    results = {}
+    for name, (func, iterations) in BENCHMARKS.items():
+        if only and name not in only:
+            continue
+        func(max(1, iterations // 10))  # прогрев
+        timings = [func(iterations) / iterations * 1e6 for _ in range(repeat)]
+        results[name] = {
+            "iterations": iterations,
+            "repeat": repeat,
+            "min_us": min(timings),
+            "median_us": statistics.median(timings),
+        }
+        print(f"{name:<34} min {results[name]['min_us']:10.3f} us  "
+              f"median {results[name]['median_us']:10.3f} us")
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "results": results,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> bool:
+    """Печатает сравнение по min_us; возвращает True, если регрессий нет"""
+    ok = True
+    for name, base in baseline["results"].items():
+        result = current["results"].get(name)
+        if result is None:
+            print(f"{name:<34} отсутствует в текущем замере")
+            continue
+        change = result["min_us"] / base["min_us"] - 1
+        regressed = change > threshold
+        ok = ok and not regressed
+        print(f"{name:<34} {base['min_us']:10.3f} -> {result['min_us']:10.3f} us  "
+              f"{change:+7.1%}{'  РЕГРЕССИЯ' if regressed else ''}")
+    return ok
+
+
+def main_cli(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="выполнить замеры")
+    run_parser.add_argument("--output", help="куда сохранить результаты в JSON")
+    run_parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    run_parser.add_argument("--only", nargs="*", default=[], choices=list(BENCHMARKS), metavar="NAME")
+
+    compare_parser = subparsers.add_parser("compare", help="сравнить с базовым замером")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current", nargs="?", help="если не задан, замеры выполняются заново")
+    compare_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    compare_parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        data = run_benchmarks(args.repeat, args.only)
+        if args.output:
+            Path(args.output).write_text(json.dumps(data, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+        return 0
+
+    baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+    if args.current:
+        current = json.loads(Path(args.current).read_text(encoding="utf-8"))
+    else:
+        current = run_benchmarks(args.repeat, list(baseline["results"]))
+        print()
+    return 0 if compare(baseline, current, args.threshold) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
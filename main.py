@@ -1,8 +1,20 @@
+import asyncio
+import copy
+import json
 import logging
-from typing import Dict, List, Tuple, Optional
+import os
+import queue
+import time
+from collections import deque
+from datetime import timedelta
+from logging.handlers import QueueHandler, QueueListener
+from typing import Awaitable, Callable, Deque, Dict, List, Tuple, Optional
 from enum import Enum, auto
 import random
+import httpx
+from sortedcontainers import SortedList
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter, TimedOut
 from telegram.ext import (
     Application,
     CommandHandler,
@@ -11,12 +23,169 @@ from telegram.ext import (
     MessageHandler,
     filters
 )
+from telegram.request import HTTPXRequest
 
+try:
+    from dotenv import load_dotenv
+except ImportError:
+    load_dotenv = None
+
+if load_dotenv is not None:
+    load_dotenv()
 # Настройка логирования
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
+LOG_QUEUE_SIZE = 10000
+LOG_DUPLICATE_WINDOW = 10  # seconds
+LOG_DUPLICATE_MAX_KEYS = 10000
+LOG_DUPLICATE_MAX_CHATS = 10000  # сколько разных chat_id помнить на одно сообщение
+LOG_CONTEXT_FIELDS = ("chat_id", "user_id", "action", "state")
+
+class JsonFormatter(logging.Formatter):
+    """Форматирует запись в одну JSON-строку с игровым контекстом"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in LOG_CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                data[field] = value
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            data["suppressed"] = suppressed
+            data["chats"] = getattr(record, "chats", 0)
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False)
+
+class BoundedQueueHandler(QueueHandler):
+    """Кладет записи в ограниченную очередь, лишние отбрасывает без блокировки"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Форматирование целиком выполняется в потоке QueueListener
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class DuplicateFilter(logging.Filter):
+    """Пропускает одну запись на сообщение за окно, повторы считает.
+
+    Ключ - логгер, уровень и отрендеренный текст без chat_id, поэтому один и
+    тот же сбой по множеству получателей подавляется как дубликат. Когда
+    окно истекает, в sink уходит сводка: сколько повторов подавлено и
+    сколько разных чатов они затронули. Если таблица ключей заполнена,
+    записи с новыми ключами тоже подавляются и учитываются общей сводкой.
+    """
+
+    def __init__(self, window: float = LOG_DUPLICATE_WINDOW, min_level: int = logging.WARNING,
+                 max_keys: int = LOG_DUPLICATE_MAX_KEYS):
+        super().__init__()
+        self.window = window
+        self.min_level = min_level
+        self.max_keys = max_keys
+        self.suppressed_total = 0
+        self.overflow = 0
+        self.sink: Optional[Callable[[logging.LogRecord], None]] = None
+        # key: [last_seen, suppressed, поля первой записи, chat_id всех записей]
+        self._entries: Dict[tuple, list] = {}
+        self._last_prune = time.monotonic()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        now = time.monotonic()
+        if now - self._last_prune >= self.window:
+            self._prune(now)
+        if record.levelno < self.min_level:
+            return True
+        message = record.getMessage()
+        key = (record.name, record.levelno, message)
+        chat_id = getattr(record, "chat_id", None)
+        entry = self._entries.get(key)
+        if entry is not None and now - entry[0] < self.window:
+            entry[1] += 1
+            if chat_id is not None and len(entry[3]) < LOG_DUPLICATE_MAX_CHATS:
+                entry[3].add(chat_id)
+            self.suppressed_total += 1
+            return False
+        if entry is not None:
+            self._report(entry)
+        elif len(self._entries) >= self.max_keys:
+            self.overflow += 1
+            self.suppressed_total += 1
+            return False
+        # Храним только нужные для сводки поля, а не саму запись с exc_info и стеком
+        fields = {"name": record.name, "levelno": record.levelno, "levelname": record.levelname, "msg": message}
+        for field in LOG_CONTEXT_FIELDS:
+            fields[field] = getattr(record, field, None)
+        self._entries[key] = [now, 0, fields, {chat_id} if chat_id is not None else set()]
+        return True
+
+    def flush(self):
+        """Сообщает обо всех еще не выведенных повторах"""
+        entries, self._entries = self._entries, {}
+        for entry in entries.values():
+            self._report(entry)
+        self._report_overflow()
+
+    def _prune(self, now: float):
+        self._last_prune = now
+        expired = [key for key, entry in self._entries.items() if now - entry[0] >= self.window]
+        for key in expired:
+            self._report(self._entries.pop(key))
+        self._report_overflow()
+
+    def _report(self, entry: list):
+        _, suppressed, fields, chat_ids = entry
+        if not suppressed or self.sink is None:
+            return
+        summary = logging.makeLogRecord(fields)
+        if len(chat_ids) > 1:
+            # Сводка по многим чатам не должна выглядеть как запись об одном из них
+            summary.chat_id = None
+            summary.user_id = None
+        summary.suppressed = suppressed
+        summary.chats = len(chat_ids)
+        self.sink(summary)
+
+    def _report_overflow(self):
+        if not self.overflow or self.sink is None:
+            return
+        summary = logging.makeLogRecord({
+            "name": __name__, "levelno": logging.WARNING, "levelname": "WARNING",
+            "msg": "Duplicate filter is full, records with new messages were suppressed",
+        })
+        summary.suppressed = self.overflow
+        summary.chats = 0
+        self.overflow = 0
+        self.sink(summary)
+
+log_queue_handler = BoundedQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+log_duplicate_filter = DuplicateFilter()
+log_duplicate_filter.sink = log_queue_handler.enqueue
+log_queue_handler.addFilter(log_duplicate_filter)
+
+def setup_logging(level: int = logging.INFO) -> QueueListener:
+    """Направляет корневой логгер в очередь; запись в поток делает QueueListener"""
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(JsonFormatter())
+    root = logging.getLogger()
+    root.handlers = [log_queue_handler]
+    root.setLevel(level)
+    return QueueListener(log_queue_handler.queue, stream_handler, respect_handler_level=True)
+
 logger = logging.getLogger(__name__)
 
 # Константы игры
@@ -27,6 +196,41 @@ ANTE_AMOUNT = 10
 MIN_RAISE = 10
 DEFAULT_TIMEOUT = 60  # seconds
 
+# Настройки доставки сообщений
+CONNECTION_POOL_SIZE = 64
+CONNECT_TIMEOUT = 5.0  # seconds
+READ_TIMEOUT = 10.0  # seconds
+WRITE_TIMEOUT = 10.0  # seconds
+POOL_TIMEOUT = 3.0  # seconds
+POLLING_TIMEOUT = 30  # seconds, long polling getUpdates
+SEND_MAX_ATTEMPTS = 4
+SEND_BACKOFF_BASE = 0.5  # seconds
+SEND_BACKOFF_MAX = 8.0  # seconds
+SEND_MAX_RETRY_AFTER = 30.0  # seconds
+SEND_HANDLER_BUDGET = 3.0  # seconds, суммарное ожидание повторов внутри обработчика
+SEND_BACKGROUND_BUDGET = 60.0  # seconds, суммарное ожидание повторов в фоновой задаче
+CIRCUIT_FAILURE_THRESHOLD = 3
+CIRCUIT_COOLDOWN = 300  # seconds
+# Ошибки BadRequest, которые относятся к самому получателю, а не к запросу
+RECIPIENT_ERROR_MARKERS = (
+    "chat not found",
+    "user not found",
+    "user is deactivated",
+    "bot was kicked",
+    "not enough rights to send",
+    "have no rights to send",
+    "peer_id_invalid",
+)
+DEAD_LETTER_LIMIT = 1000
+BIDDING_PROMPT_ATTEMPTS = 3
+BIDDING_PROMPT_RETRY_DELAY = 30  # seconds
+LEADERBOARD_SIZE = 10
+
+# Администрирование и статистика
+ADMIN_IDS = {int(x) for x in os.getenv("ADMIN_IDS", "").split(",") if x.strip().isdigit()}
+STATS_BUCKET_SECONDS = 10
+STATS_WINDOW = 300  # seconds
+
 # Состояния разговора
 class GameState(Enum):
     WAITING_FOR_PLAYERS = auto()
@@ -75,6 +279,7 @@ class Player:
         self.is_dark = False
         self.folded = False
         self.current_bet = 0
+        self.round_bet = 0  # все ставки за раунд, включая анте и свару
         self.ready = False
         self.last_action_time = None
     
@@ -83,6 +288,7 @@ class Player:
         self.is_dark = False
         self.folded = False
         self.current_bet = 0
+        self.round_bet = 0
         self.ready = False
         self.last_action_time = None
     
@@ -96,6 +302,7 @@ class Player:
         
         self.chips -= amount
         self.current_bet += amount
+        self.round_bet += amount
         return True
     
     def get_hand_value(self) -> Tuple[int, str]:
@@ -147,13 +354,30 @@ class Game:
         self.pot = 0
         self.current_bidder_index = 0
         self.current_max_bet = 0
-        self.state = GameState.WAITING_FOR_PLAYERS
+        self._state = GameState.WAITING_FOR_PLAYERS
         self.bid_history = []
         self.swara_pot = 0
         self.last_raiser: Optional[Player] = None
         self.min_raise = MIN_RAISE
         self.chat_id = None
         self.creator_id = None
+        self.prompt_seq = 0  # номер последнего приглашения к ходу
+    
+    @property
+    def state(self) -> GameState:
+        return self._state
+    
+    @state.setter
+    def state(self, new_state: GameState):
+        if new_state != self._state:
+            if self.is_open:
+                live_stats.state_changed(self._state, new_state)
+            self._state = new_state
+    
+    @property
+    def is_open(self) -> bool:
+        """Стол зарегистрирован в active_games; только такие попадают в live_stats"""
+        return active_games.get(self.chat_id) is self
     
     @property
     def active_players(self) -> List[Player]:
@@ -170,10 +394,14 @@ class Game:
         if len(self.players) >= MAX_PLAYERS:
             raise ValueError("Maximum players reached")
         self.players[player.user_id] = player
+        if self.is_open:
+            live_stats.players_online += 1
     
     def remove_player(self, user_id: int):
         if user_id in self.players:
             del self.players[user_id]
+            if self.is_open:
+                live_stats.players_online -= 1
     
     def initialize_deck(self):
         self.deck = [Card(rank, suit) for suit in Card.SUITS for rank in Card.RANKS]
@@ -230,18 +458,393 @@ class Game:
         self.current_bidder_index = 0
         self.state = GameState.WAITING_FOR_PLAYERS
 
+class PlayerProfile:
+    """Сквозной профиль игрока по всем чатам"""
+
+    def __init__(self, user_id: int, name: str):
+        self.user_id = user_id
+        self.name = name
+        self.net_winnings = 0
+        self.wins = 0
+
+class Leaderboard:
+    """Глобальный рейтинг по чистому выигрышу (выплаты минус собственные ставки).
+
+    Ключи (-net_winnings, user_id) хранятся в SortedList, поэтому обновление,
+    место игрока и первые K позиций стоят O(log n) без полной сортировки.
+    """
+
+    def __init__(self):
+        self.profiles: Dict[int, PlayerProfile] = {}
+        self._ranking = SortedList()
+
+    def __len__(self):
+        return len(self.profiles)
+
+    def register(self, player: Player) -> PlayerProfile:
+        profile = self.profiles.get(player.user_id)
+        if profile is None:
+            profile = PlayerProfile(player.user_id, player.name)
+            self.profiles[player.user_id] = profile
+            self._ranking.add((-profile.net_winnings, profile.user_id))
+        else:
+            profile.name = player.name
+        return profile
+
+    def record_result(self, player: Player, net: int, won: bool = False):
+        profile = self.register(player)
+        self._ranking.remove((-profile.net_winnings, profile.user_id))
+        profile.net_winnings += net
+        if won:
+            profile.wins += 1
+        self._ranking.add((-profile.net_winnings, profile.user_id))
+
+    def record_round(self, game: Game, winner: Player, payout: int):
+        """Учитывает итог раунда для всех, кто ставил, и для победителя"""
+        for player in game.players.values():
+            won = player is winner
+            if won or player.round_bet:
+                self.record_result(player, (payout if won else 0) - player.round_bet, won)
+
+    def top(self, k: int = LEADERBOARD_SIZE) -> List[PlayerProfile]:
+        return [self.profiles[user_id] for _, user_id in self._ranking.islice(0, k)]
+
+    def rank(self, user_id: int) -> Optional[int]:
+        """Место игрока (1 - лучший), игроки с равным выигрышем делят место"""
+        profile = self.profiles.get(user_id)
+        if profile is None:
+            return None
+        return self._ranking.bisect_left((-profile.net_winnings,)) + 1
+
+# Статистика
+class RollingCounter:
+    """Сумма значений за скользящее окно, разбитое на фиксированные интервалы.
+
+    Стоимость запроса зависит только от числа интервалов, а не от нагрузки.
+    """
+
+    def __init__(self, window: int = STATS_WINDOW, bucket_seconds: int = STATS_BUCKET_SECONDS):
+        self.bucket_seconds = bucket_seconds
+        self.size = max(1, window // bucket_seconds)
+        self._values = [0.0] * self.size
+        self._slots = [-1] * self.size
+
+    def _slot(self, now: Optional[float]) -> int:
+        return int((time.monotonic() if now is None else now) // self.bucket_seconds)
+
+    def add(self, value: float = 1, now: Optional[float] = None):
+        slot = self._slot(now)
+        i = slot % self.size
+        if self._slots[i] != slot:
+            self._slots[i] = slot
+            self._values[i] = 0.0
+        self._values[i] += value
+
+    def total(self, now: Optional[float] = None) -> float:
+        slot = self._slot(now)
+        return sum(
+            value for value, bucket_slot in zip(self._values, self._slots)
+            if slot - bucket_slot < self.size
+        )
+
+class LiveStats:
+    """Агрегаты для /stats, обновляемые прямо в обработчиках"""
+
+    def __init__(self):
+        self.tables_by_state: Dict[GameState, int] = {state: 0 for state in GameState}
+        self.players_online = 0
+        self.rounds = RollingCounter()
+        self.pot_total = RollingCounter()
+        self.swaras = RollingCounter()
+        self.api_requests = RollingCounter()
+        self.api_errors: Dict[str, RollingCounter] = {}
+        self.started_at = time.monotonic()
+
+    def window_seconds(self, now: Optional[float] = None) -> float:
+        """Фактическая длина окна: сразу после запуска данных меньше, чем STATS_WINDOW"""
+        elapsed = (time.monotonic() if now is None else now) - self.started_at
+        return min(STATS_WINDOW, max(STATS_BUCKET_SECONDS, elapsed))
+
+    def state_changed(self, old: Optional[GameState], new: Optional[GameState]):
+        if old is not None:
+            self.tables_by_state[old] -= 1
+        if new is not None:
+            self.tables_by_state[new] += 1
+
+    def table_opened(self, game: Game):
+        self.state_changed(None, game.state)
+        self.players_online += len(game.players)
+
+    def table_closed(self, game: Game):
+        self.state_changed(game.state, None)
+        self.players_online -= len(game.players)
+
+    def round_finished(self, pot: int):
+        self.rounds.add()
+        self.pot_total.add(pot)
+
+    def api_request(self, error_kind: Optional[str] = None):
+        self.api_requests.add()
+        if error_kind is not None:
+            if error_kind not in self.api_errors:
+                self.api_errors[error_kind] = RollingCounter()
+            self.api_errors[error_kind].add()
+
+
 # Глобальные переменные игры
 active_games: Dict[int, Game] = {}  # key: chat_id
 user_data_cache = {}
+leaderboard = Leaderboard()
+live_stats = LiveStats()
+
+# Доставка сообщений
+class InstrumentedRequest(HTTPXRequest):
+    """HTTPXRequest, который учитывает в live_stats каждый запрос к Bot API"""
+
+    async def do_request(self, *args, **kwargs) -> Tuple[int, bytes]:
+        try:
+            status_code, payload = await super().do_request(*args, **kwargs)
+        except Exception as e:
+            live_stats.api_request(type(e).__name__)
+            raise
+        live_stats.api_request(f"HTTP {status_code}" if status_code >= 400 else None)
+        return status_code, payload
+
+class CircuitBreaker:
+    """Размыкатель цепи по получателям: после серии неудач отправка
+    получателю приостанавливается на время cooldown.
+
+    Учитываются только ошибки самого получателя (Forbidden и BadRequest
+    вроде "chat not found"); сбои Telegram и сети цепь не размыкают.
+    Записи старше cooldown периодически удаляются, чтобы получатели,
+    которым больше не пишут, не копились в памяти.
+    """
+
+    def __init__(self, threshold: int = CIRCUIT_FAILURE_THRESHOLD, cooldown: float = CIRCUIT_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._failures: Dict[int, Tuple[int, float]] = {}  # chat_id: (неудачи, время последней)
+        self._opened_at: Dict[int, float] = {}
+        self._last_prune = time.monotonic()
+
+    def __len__(self):
+        return len(self._failures) + len(self._opened_at)
+
+    def allow(self, chat_id: int) -> bool:
+        now = time.monotonic()
+        self._maybe_prune(now)
+        opened_at = self._opened_at.get(chat_id)
+        if opened_at is None:
+            return True
+        if now - opened_at < self.cooldown:
+            return False
+        # Полуоткрытое состояние: одна пробная попытка, при неудаче цепь снова размыкается
+        del self._opened_at[chat_id]
+        self._failures[chat_id] = (self.threshold - 1, now)
+        return True
+
+    def _maybe_prune(self, now: float):
+        if now - self._last_prune < self.cooldown:
+            return
+        self._last_prune = now
+        self._opened_at = {
+            chat_id: opened_at for chat_id, opened_at in self._opened_at.items()
+            if now - opened_at < self.cooldown
+        }
+        self._failures = {
+            chat_id: entry for chat_id, entry in self._failures.items()
+            if now - entry[1] < self.cooldown
+        }
+
+    def is_open(self, chat_id: int) -> bool:
+        return chat_id in self._opened_at
+
+    def record_success(self, chat_id: int):
+        self._failures.pop(chat_id, None)
+        self._opened_at.pop(chat_id, None)
+
+    def record_failure(self, chat_id: int):
+        now = time.monotonic()
+        failures = self._failures.get(chat_id, (0, now))[0] + 1
+        if failures >= self.threshold:
+            self.trip(chat_id)
+        else:
+            self._failures[chat_id] = (failures, now)
+
+    def trip(self, chat_id: int):
+        now = time.monotonic()
+        self._maybe_prune(now)
+        self._failures.pop(chat_id, None)
+        self._opened_at[chat_id] = now
+
+
+recipient_breaker = CircuitBreaker()
+dead_letters: Deque[dict] = deque(maxlen=DEAD_LETTER_LIMIT)
+dead_letter_logger = logging.getLogger(f"{__name__}.dead_letter")
+
+def log_context(chat_id: Optional[int] = None, user_id: Optional[int] = None,
+                action: Optional[str] = None) -> dict:
+    """Поля для extra= у записей лога; состояние берется из игры в чате"""
+    game = active_games.get(chat_id)
+    return {
+        "chat_id": chat_id,
+        "user_id": user_id,
+        "action": action,
+        "state": game.state.name if game else None,
+    }
+
+def _dead_letter(chat_id: int, text: str, reason: str):
+    dead_letters.append({"time": time.time(), "chat_id": chat_id, "text": text, "reason": reason})
+    dead_letter_logger.warning(
+        "Message dropped: %s", reason, extra=log_context(chat_id, action="send")
+    )
+
+def _retry_after_seconds(error: RetryAfter) -> float:
+    delay = error.retry_after
+    if isinstance(delay, timedelta):
+        return delay.total_seconds()
+    return float(delay)
+
+def _is_recipient_error(error: BadRequest) -> bool:
+    message = str(error).lower()
+    return any(marker in message for marker in RECIPIENT_ERROR_MARKERS)
+
+def _request_not_sent(error: NetworkError) -> bool:
+    """Можно ли повторить запрос без риска отправить сообщение дважды.
+
+    Таймаут чтения означает, что Telegram мог уже принять сообщение, и повтор
+    продублирует карты или клавиатуру торгов. Безопасны только таймауты
+    пула и соединения. Прочие сетевые ошибки (отказ соединения, 5xx от Bot API)
+    повторяются: риск дубля для них мал и принимается сознательно.
+    """
+    if isinstance(error, TimedOut):
+        return isinstance(error.__cause__, (httpx.PoolTimeout, httpx.ConnectTimeout))
+    return True
+
+def _backoff_delay(attempt: int) -> float:
+    """Экспоненциальная задержка с полным джиттером"""
+    return random.uniform(0, min(SEND_BACKOFF_MAX, SEND_BACKOFF_BASE * 2 ** attempt))
+
+async def _send_with_retries(context: ContextTypes.DEFAULT_TYPE, chat_id: int, text: str,
+                             reply_markup: Optional[InlineKeyboardMarkup],
+                             budget: float) -> Tuple[bool, Optional[float], str]:
+    """Пытается отправить сообщение, ожидая между попытками не больше budget секунд.
+
+    Возвращает (доставлено, задержка до следующей попытки, причина неудачи).
+    Задержка не None, если повтор возможен, но не укладывается в budget.
+    """
+    deadline = time.monotonic() + budget
+    last_error: Optional[Exception] = None
+    for attempt in range(SEND_MAX_ATTEMPTS):
+        try:
+            await context.bot.send_message(chat_id=chat_id, text=text, reply_markup=reply_markup)
+        except Forbidden as e:
+            # Пользователь заблокировал бота - повторять бессмысленно
+            recipient_breaker.trip(chat_id)
+            return False, None, f"forbidden: {e}"
+        except RetryAfter as e:
+            last_error = e
+            delay = _retry_after_seconds(e)
+            if delay > SEND_MAX_RETRY_AFTER:
+                break
+            delay += random.uniform(0, SEND_BACKOFF_BASE)
+        except BadRequest as e:
+            # Размыкаем цепь только при проблемах с самим получателем
+            if _is_recipient_error(e):
+                recipient_breaker.record_failure(chat_id)
+            return False, None, f"bad request: {e}"
+        except NetworkError as e:
+            last_error = e
+            if not _request_not_sent(e):
+                return False, None, f"timed out, may have been delivered: {e}"
+            delay = _backoff_delay(attempt)
+        except Exception as e:
+            logger.exception(
+                "Unexpected error while sending message", extra=log_context(chat_id, action="send")
+            )
+            return False, None, f"unexpected: {e}"
+        else:
+            recipient_breaker.record_success(chat_id)
+            return True, None, ""
+
+        if attempt + 1 == SEND_MAX_ATTEMPTS:
+            break
+        if time.monotonic() + delay > deadline:
+            return False, delay, f"deferred: {last_error}"
+        logger.warning(
+            "Send failed (%s), retry %d/%d in %.1fs",
+            type(last_error).__name__, attempt + 1, SEND_MAX_ATTEMPTS - 1, delay,
+            extra=log_context(chat_id, action="send")
+        )
+        await asyncio.sleep(delay)
+
+    # Ограничение частоты, 5xx и сетевые ошибки - сбои Telegram или сети, а не получателя,
+    # поэтому цепь для него не размыкается
+    return False, None, f"gave up: {last_error}"
+
+OnFailure = Optional[Callable[[], Awaitable[None]]]
+
+async def _give_up(chat_id: int, text: str, reason: str, on_failure: OnFailure):
+    _dead_letter(chat_id, text, reason)
+    if on_failure is not None:
+        await on_failure()
+
+async def _deliver_later(context: ContextTypes.DEFAULT_TYPE, chat_id: int, text: str,
+                         reply_markup: Optional[InlineKeyboardMarkup], delay: float,
+                         on_failure: OnFailure):
+    await asyncio.sleep(delay)
+    delivered, _, reason = await _send_with_retries(
+        context, chat_id, text, reply_markup, SEND_BACKGROUND_BUDGET
+    )
+    if not delivered:
+        await _give_up(chat_id, text, reason, on_failure)
+
+async def deliver(context: ContextTypes.DEFAULT_TYPE, chat_id: int, text: str,
+                  reply_markup: Optional[InlineKeyboardMarkup] = None,
+                  on_failure: OnFailure = None) -> bool:
+    """Отправляет сообщение с повторами; недоставленное попадает в dead_letters.
+
+    Внутри обработчика повторы ждут не дольше SEND_HANDLER_BUDGET: обновления
+    обрабатываются по одному, и долгий сон остановил бы все столы. Более
+    долгие повторы уходят в фоновую задачу, тогда возвращается True -
+    сообщение принято к доставке. on_failure вызывается, если сообщение
+    окончательно не доставлено, в том числе из фоновой задачи.
+    """
+    if not recipient_breaker.allow(chat_id):
+        await _give_up(chat_id, text, "circuit open", on_failure)
+        return False
+
+    delivered, retry_in, reason = await _send_with_retries(
+        context, chat_id, text, reply_markup, SEND_HANDLER_BUDGET
+    )
+    if delivered:
+        return True
+    if retry_in is not None:
+        logger.warning(
+            "Send deferred to background, retry in %.1fs", retry_in,
+            extra=log_context(chat_id, action="send")
+        )
+        context.application.create_task(
+            _deliver_later(context, chat_id, text, reply_markup, retry_in, on_failure)
+        )
+        return True
+    await _give_up(chat_id, text, reason, on_failure)
+    return False
 
 # Вспомогательные функции
+def open_game(chat_id: int, game: Game):
+    close_game(chat_id)
+    game.chat_id = chat_id
+    active_games[chat_id] = game
+    live_stats.table_opened(game)
+
+def close_game(chat_id: int):
+    game = active_games.pop(chat_id, None)
+    if game is not None:
+        live_stats.table_closed(game)
+
 async def send_private_message(context: ContextTypes.DEFAULT_TYPE, player: Player, text: str):
-    try:
-        await context.bot.send_message(chat_id=player.user_id, text=text)
-    except Exception as e:
-        logger.error(f"Failed to send message to {player.user_id}: {e}")
-        return False
-    return True
+    return await deliver(context, player.user_id, text)
 
 async def notify_all_players(context: ContextTypes.DEFAULT_TYPE, game: Game, text: str):
     for player in game.players.values():
@@ -257,13 +860,13 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     
     game = Game()
-    game.chat_id = chat_id
     game.creator_id = user.id
-    active_games[chat_id] = game
+    open_game(chat_id, game)
     
     # Автоматически добавляем создателя в игру
     player = Player(user.id, user.full_name)
     game.add_player(player)
+    leaderboard.register(player)
     
     await update.message.reply_text(
         "🎮 Игра Сека начата! Используйте /join чтобы присоединиться.\n"
@@ -291,6 +894,7 @@ async def join(update: Update, context: ContextTypes.DEFAULT_TYPE):
     except ValueError:
         await update.message.reply_text(f"В игре уже максимальное количество игроков ({MAX_PLAYERS})!")
         return
+    leaderboard.register(player)
     
     await update.message.reply_text(
         f"👋 {user.full_name} присоединился к игре!\n"
@@ -376,9 +980,15 @@ async def send_bidding_options(update: Update, context: ContextTypes.DEFAULT_TYP
     chat_id = update.effective_chat.id
     game = active_games[chat_id]
     
+    if not game.current_player:
+        await end_round(update, context)
+        return
+    
+    await post_bidding_prompt(context, game)
+
+async def post_bidding_prompt(context: ContextTypes.DEFAULT_TYPE, game: Game, attempt: int = 0):
     current_player = game.current_player
     if not current_player:
-        await end_round(update, context)
         return
     
     keyboard = []
@@ -403,16 +1013,48 @@ async def send_bidding_options(update: Update, context: ContextTypes.DEFAULT_TYP
     
     reply_markup = InlineKeyboardMarkup(keyboard)
     
-    try:
-        await context.bot.send_message(
-            chat_id=chat_id,
-            text=f"🎲 Ход {current_player.name}\n"
-                 f"💵 Текущая ставка: {game.current_max_bet}\n"
-                 f"💰 Банк: {game.pot}",
-            reply_markup=reply_markup
-        )
-    except Exception as e:
-        logger.error(f"Ошибка при отправке сообщения: {e}")
+    game.prompt_seq += 1
+    prompt_seq = game.prompt_seq
+    
+    async def on_failure():
+        await bidding_prompt_failed(context, game, prompt_seq, attempt)
+    
+    await deliver(
+        context,
+        game.chat_id,
+        f"🎲 Ход {current_player.name}\n"
+        f"💵 Текущая ставка: {game.current_max_bet}\n"
+        f"💰 Банк: {game.pot}",
+        reply_markup=reply_markup,
+        on_failure=on_failure
+    )
+
+async def bidding_prompt_failed(context: ContextTypes.DEFAULT_TYPE, game: Game, prompt_seq: int, attempt: int):
+    """Без приглашения к ходу стол ждал бы вечно: повторяем его позже, а потом закрываем стол"""
+    if not game.is_open or game.prompt_seq != prompt_seq:
+        return
+    
+    if attempt + 1 < BIDDING_PROMPT_ATTEMPTS:
+        context.application.create_task(repost_bidding_prompt(context, game, prompt_seq, attempt + 1))
+        return
+    
+    logger.error(
+        "Bidding prompt undeliverable, closing table",
+        extra=log_context(game.chat_id, action="bidding_prompt")
+    )
+    close_game(game.chat_id)
+    await notify_all_players(
+        context,
+        game,
+        "⚠ Не удалось отправить ход в чат игры, игра остановлена.\n"
+        "Используйте /start чтобы начать новую игру."
+    )
+
+async def repost_bidding_prompt(context: ContextTypes.DEFAULT_TYPE, game: Game, prompt_seq: int, attempt: int):
+    await asyncio.sleep(BIDDING_PROMPT_RETRY_DELAY)
+    # Пока мы ждали, игра могла продолжиться или закончиться
+    if game.is_open and game.prompt_seq == prompt_seq:
+        await post_bidding_prompt(context, game, attempt)
 
 async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
@@ -432,6 +1074,7 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     
     action = query.data
+    logger.info("Player action", extra=log_context(chat_id, user_id, action))
     
     if action == "fold":
         current_player.folded = True
@@ -531,11 +1174,10 @@ async def handle_raise_amount(update: Update, context: ContextTypes.DEFAULT_TYPE
     game.pot += call_amount + raise_amount
     game.current_max_bet = total_bet
     game.last_raiser = player
+    logger.info("Raise to %d", total_bet, extra=log_context(chat_id, user_id, "raise"))
     
-    await context.bot.send_message(
-        chat_id=chat_id,
-        text=f"📈 {player.name} повышает ставку до {total_bet}!"
-    )
+    if not await deliver(context, chat_id, f"📈 {player.name} повышает ставку до {total_bet}!"):
+        await update.message.reply_text("Ставка принята, но сообщить о ней в чат игры не удалось.")
     
     # Переход хода или завершение круга торгов
     if not game.next_turn():
@@ -547,7 +1189,8 @@ async def handle_raise_amount(update: Update, context: ContextTypes.DEFAULT_TYPE
         await end_round(update, context)
         return
     
-    await send_bidding_options(update, context)
+    # Сумма повышения приходит в личку, поэтому ход публикуется в чат игры напрямую
+    await post_bidding_prompt(context, game)
 
 async def compare_hands(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = update.effective_chat.id
@@ -564,6 +1207,8 @@ async def compare_hands(update: Update, context: ContextTypes.DEFAULT_TYPE):
             f"🏆 {winner.name} выигрывает банк в размере {game.pot}!"
         )
         winner.chips += game.pot
+        leaderboard.record_round(game, winner, game.pot)
+        live_stats.round_finished(game.pot)
         await prepare_new_round(update, context)
         return
     
@@ -592,6 +1237,7 @@ async def compare_hands(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         
         game.state = GameState.SWARA
+        live_stats.swaras.add()
         game.swara_pot = game.pot
         game.pot = 0
         
@@ -632,6 +1278,8 @@ async def compare_hands(update: Update, context: ContextTypes.DEFAULT_TYPE):
             winner = winners[0]
             total_pot = game.swara_pot + game.pot
             winner.chips += total_pot
+            leaderboard.record_round(game, winner, total_pot)
+            live_stats.round_finished(total_pot)
             await update.effective_chat.send_message(
                 f"🏆 {winner.name} выигрывает свару и получает {total_pot}!"
             )
@@ -640,6 +1288,8 @@ async def compare_hands(update: Update, context: ContextTypes.DEFAULT_TYPE):
         # Есть явный победитель
         winner = results[0][0]
         winner.chips += game.pot
+        leaderboard.record_round(game, winner, game.pot)
+        live_stats.round_finished(game.pot)
         await update.effective_chat.send_message(
             f"{message}\n\n🏆 {winner.name} выигрывает банк в размере {game.pot}!"
         )
@@ -663,7 +1313,7 @@ async def prepare_new_round(update: Update, context: ContextTypes.DEFAULT_TYPE):
             f"Недостаточно игроков ({len(game.players)}/{MIN_PLAYERS}). Игра завершена.\n"
             "Используйте /start чтобы начать новую игру."
         )
-        del active_games[chat_id]
+        close_game(chat_id)
         return
     
     # Подготовка к новому раунду
@@ -676,8 +1326,7 @@ async def prepare_new_round(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = update.effective_chat.id
-    if chat_id in active_games:
-        del active_games[chat_id]
+    close_game(chat_id)
     await update.message.reply_text("❌ Игра отменена.")
 
 async def show_balance(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -696,6 +1345,67 @@ async def show_balance(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "💰 Балансы игроков:\n" + balance_text
     )
 
+async def show_top(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = update.effective_user.id
+    top_players = leaderboard.top()
+    if not top_players:
+        await update.message.reply_text("Рейтинг пока пуст.")
+        return
+    
+    top_text = "\n".join(
+        f"{i}. {profile.name}: {profile.net_winnings:+d} фишек ({profile.wins} побед)"
+        for i, profile in enumerate(top_players, 1)
+    )
+    
+    rank = leaderboard.rank(user_id)
+    if rank is None:
+        rank_text = "Вы еще не участвовали в играх."
+    else:
+        rank_text = f"Ваше место: {rank} из {len(leaderboard)}"
+    
+    await update.message.reply_text(
+        "🏆 Лучшие игроки (чистый выигрыш):\n" + top_text + "\n\n" + rank_text
+    )
+
+async def show_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if update.effective_user.id not in ADMIN_IDS:
+        await update.message.reply_text("Команда доступна только администраторам.")
+        return
+    
+    window_minutes = live_stats.window_seconds() / 60
+    rounds = live_stats.rounds.total()
+    swaras = live_stats.swaras.total()
+    requests_total = live_stats.api_requests.total()
+    errors = {kind: counter.total() for kind, counter in live_stats.api_errors.items()}
+    errors_total = sum(errors.values())
+    
+    tables_text = "\n".join(
+        f"• {state.name}: {count}"
+        for state, count in live_stats.tables_by_state.items()
+    )
+    errors_text = "\n".join(
+        f"• {kind}: {int(count)}"
+        for kind, count in sorted(errors.items()) if count
+    )
+    
+    stats_text = (
+        f"📊 Статистика (окно {window_minutes:.1f} мин):\n\n"
+        f"🎲 Столы: {sum(live_stats.tables_by_state.values())}\n{tables_text}\n\n"
+        f"👥 Игроков за столами: {live_stats.players_online}\n"
+        f"🔄 Раундов в минуту: {rounds / window_minutes:.2f}\n"
+        f"💰 Средний банк: {live_stats.pot_total.total() / rounds if rounds else 0:.1f}\n"
+        f"⚔ Частота свары: {swaras / rounds * 100 if rounds else 0:.1f}%\n\n"
+        f"📡 Запросов к Bot API: {int(requests_total)}, "
+        f"ошибок: {int(errors_total)} ({errors_total / requests_total * 100 if requests_total else 0:.1f}%)\n"
+        f"📭 Недоставленных сообщений: {len(dead_letters)}\n"
+        f"📝 Лог: отброшено {log_queue_handler.dropped}, "
+        f"подавлено повторов {log_duplicate_filter.suppressed_total}"
+    )
+    if errors_text:
+        stats_text += "\n\n❗ Ошибки по типам:\n" + errors_text
+    
+    await update.message.reply_text(stats_text)
+
 async def rules(update: Update, context: ContextTypes.DEFAULT_TYPE):
     rules_text = (
         "📖 Правила игры Сека:\n\n"
@@ -725,6 +1435,7 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "👋 /join - присоединиться к игре\n"
         "✅ /ready - отметить готовность\n"
         "💰 /balance - показать балансы\n"
+        "🏆 /top - глобальный рейтинг игроков\n"
         "📖 /rules - показать правила\n"
         "❌ /cancel - отменить игру\n\n"
         "🎲 Во время игры используйте кнопки для совершения действий."
@@ -732,8 +1443,40 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(help_text)
 
 def main():
+    log_listener = setup_logging()
+    log_listener.start()
+    
+    if not ADMIN_IDS:
+        logger.warning(
+            "ADMIN_IDS is empty%s, /stats is disabled for everyone",
+            "" if load_dotenv else " (python-dotenv is not installed, .env was not loaded)"
+        )
+    
+    # Общий пул соединений для всех исходящих запросов к Bot API
+    request = InstrumentedRequest(
+        connection_pool_size=CONNECTION_POOL_SIZE,
+        connect_timeout=CONNECT_TIMEOUT,
+        read_timeout=READ_TIMEOUT,
+        write_timeout=WRITE_TIMEOUT,
+        pool_timeout=POOL_TIMEOUT
+    )
+    # getUpdates держит соединение до POLLING_TIMEOUT, поэтому у него свой пул из одного
+    # соединения; PTB сам добавляет timeout опроса к read_timeout
+    get_updates_request = HTTPXRequest(
+        connection_pool_size=1,
+        connect_timeout=CONNECT_TIMEOUT,
+        read_timeout=READ_TIMEOUT,
+        write_timeout=WRITE_TIMEOUT,
+        pool_timeout=POOL_TIMEOUT
+    )
     # Замените 'YOUR_BOT_TOKEN' на реальный токен вашего бота
-    application = Application.builder().token("6939360001:AAFI3w7MzpR-10314IstaCQwChx5ByFvMhk").build()
+    application = (
+        Application.builder()
+        .token("6939360001:AAFI3w7MzpR-10314IstaCQwChx5ByFvMhk")
+        .request(request)
+        .get_updates_request(get_updates_request)
+        .build()
+    )
     
     # Обработчики команд
     command_handlers = {
@@ -742,6 +1485,8 @@ def main():
         'ready': ready,
         'begin': begin_game,
         'balance': show_balance,
+        'top': show_top,
+        'stats': show_stats,
         'rules': rules,
         'help': help_command,
         'cancel': cancel
@@ -760,7 +1505,11 @@ def main():
     application.add_handler(CallbackQueryHandler(button_handler))
     
     # Запуск бота
-    application.run_polling()
+    try:
+        application.run_polling(timeout=POLLING_TIMEOUT)
+    finally:
+        log_duplicate_filter.flush()
+        log_listener.stop()
 
 if __name__ == '__main__':
     main()
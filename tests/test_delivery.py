@@ -0,0 +1,286 @@
+import asyncio
+import time
+from collections import deque
+from types import SimpleNamespace
+from urllib.parse import parse_qs
+
+import httpx
+import pytest
+from telegram import Bot
+from telegram.request import HTTPXRequest
+
+import main
+
+CHAT_ID = 42
+
+
+def api_error(code: int, description: str, **parameters) -> httpx.Response:
+    payload = {"ok": False, "error_code": code, "description": description}
+    if parameters:
+        payload["parameters"] = parameters
+    return httpx.Response(code, json=payload)
+
+
+def retry_after(seconds: int) -> httpx.Response:
+    return api_error(429, f"Too Many Requests: retry after {seconds}", retry_after=seconds)
+
+
+BLOCKED = api_error(403, "Forbidden: bot was blocked by the user")
+CHAT_NOT_FOUND = api_error(400, "Bad Request: chat not found")
+EMPTY_TEXT = api_error(400, "Bad Request: message text is empty")
+BAD_GATEWAY = api_error(502, "Bad Gateway")
+
+
+class FakeBotApi:
+    """Локальный Bot API на httpx.MockTransport.
+
+    На sendMessage по очереди отдает заданные ответы: httpx.Response, класс
+    исключения httpx (таймауты) или None - успешную отправку.
+    """
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = []
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        method = request.url.path.rsplit("/", 1)[-1]
+        if method == "getMe":
+            return httpx.Response(200, json={"ok": True, "result": {
+                "id": 1, "is_bot": True, "first_name": "Seka", "username": "seka_bot"
+            }})
+
+        params = {key: values[0] for key, values in parse_qs(request.content.decode()).items()}
+        chat_id = int(params["chat_id"])
+        self.calls.append({"chat_id": chat_id, "text": params["text"]})
+
+        outcome = self.outcomes.pop(0) if self.outcomes else None
+        if isinstance(outcome, type) and issubclass(outcome, httpx.HTTPError):
+            raise outcome("injected", request=request)
+        if outcome is not None:
+            return outcome
+        return httpx.Response(200, json={"ok": True, "result": {
+            "message_id": len(self.calls), "date": 0,
+            "chat": {"id": chat_id, "type": "private"}, "text": params["text"]
+        }})
+
+    def make_bot(self) -> Bot:
+        transport = httpx.MockTransport(self.handle)
+        return Bot(
+            "1:TEST",
+            request=HTTPXRequest(httpx_kwargs={"transport": transport}),
+            get_updates_request=HTTPXRequest(httpx_kwargs={"transport": transport}),
+        )
+
+    def run(self, func):
+        """Вызывает func(context) с настоящим Bot и выполняет запущенные фоновые задачи"""
+        background = []
+
+        async def run():
+            async with self.make_bot() as bot:
+                context = SimpleNamespace(bot=bot, application=SimpleNamespace(create_task=background.append))
+                result = await func(context)
+                while background:
+                    await background.pop(0)
+                return result
+
+        return asyncio.run(run())
+
+    def deliver(self, text: str = "hello") -> bool:
+        return self.run(lambda context: main.deliver(context, CHAT_ID, text))
+
+
+@pytest.fixture(autouse=True)
+def delivery_state(monkeypatch):
+    sleeps = []
+    clock = [1000.0]
+
+    async def fake_sleep(delay):
+        sleeps.append(delay)
+        clock[0] += delay
+
+    monkeypatch.setattr(main, "time", SimpleNamespace(monotonic=lambda: clock[0], time=time.time))
+    monkeypatch.setattr(main, "SEND_BACKOFF_BASE", 0.01)
+    monkeypatch.setattr(main, "SEND_BACKOFF_MAX", 0.02)
+    monkeypatch.setattr(main.asyncio, "sleep", fake_sleep)
+    monkeypatch.setattr(main, "recipient_breaker", main.CircuitBreaker())
+    monkeypatch.setattr(main, "dead_letters", deque(maxlen=main.DEAD_LETTER_LIMIT))
+    monkeypatch.setattr(main, "live_stats", main.LiveStats())
+    return sleeps
+
+
+def last_reason() -> str:
+    return main.dead_letters[-1]["reason"]
+
+
+@pytest.mark.parametrize("timeout", [httpx.ConnectTimeout, httpx.PoolTimeout])
+def test_timeout_before_sending_is_retried(delivery_state, timeout):
+    api = FakeBotApi(timeout, None)
+
+    assert api.deliver()
+    assert len(api.calls) == 2
+    assert len(delivery_state) == 1
+    assert not main.dead_letters
+    assert not main.recipient_breaker.is_open(CHAT_ID)
+
+
+def test_read_timeout_is_not_retried():
+    api = FakeBotApi(httpx.ReadTimeout, None)
+
+    assert not api.deliver()
+    assert len(api.calls) == 1
+    assert last_reason().startswith("timed out, may have been delivered")
+
+
+def test_retry_after_within_handler_budget(delivery_state):
+    api = FakeBotApi(retry_after(2), None)
+
+    assert api.deliver()
+    assert len(api.calls) == 2
+    assert delivery_state[0] >= 2
+    assert not main.dead_letters
+
+
+def test_long_retry_after_is_deferred_to_background(delivery_state):
+    api = FakeBotApi(retry_after(20), None)
+
+    assert api.deliver()
+    assert len(api.calls) == 2
+    # Единственное ожидание - в фоновой задаче, обработчик не спал
+    assert len(delivery_state) == 1
+    assert delivery_state[0] >= 20
+    assert not main.dead_letters
+
+
+def test_background_retries_are_bounded(delivery_state):
+    api = FakeBotApi(*[retry_after(30)] * main.SEND_MAX_ATTEMPTS)
+
+    assert api.deliver()
+    assert sum(delivery_state) <= 30 + main.SEND_BACKGROUND_BUDGET
+    assert last_reason().startswith("deferred")
+    assert len(main.recipient_breaker) == 0
+
+
+def test_retry_after_over_limit_gives_up_without_tripping_breaker(delivery_state):
+    api = FakeBotApi(retry_after(int(main.SEND_MAX_RETRY_AFTER) + 1))
+
+    assert not api.deliver()
+    assert len(api.calls) == 1
+    assert not delivery_state
+    assert last_reason().startswith("gave up")
+    assert len(main.recipient_breaker) == 0
+
+
+def test_forbidden_trips_breaker_and_short_circuits_next_send():
+    api = FakeBotApi(BLOCKED)
+
+    assert not api.deliver()
+    assert main.recipient_breaker.is_open(CHAT_ID)
+    assert last_reason() == "forbidden: Forbidden: bot was blocked by the user"
+
+    assert not api.deliver("second")
+    assert len(api.calls) == 1
+    letter = main.dead_letters[-1]
+    assert (letter["chat_id"], letter["text"], letter["reason"]) == (CHAT_ID, "second", "circuit open")
+
+
+def test_bad_request_is_not_retried():
+    api = FakeBotApi(EMPTY_TEXT, None)
+
+    assert not api.deliver()
+    assert len(api.calls) == 1
+    assert last_reason() == "bad request: Message text is empty"
+    assert len(main.recipient_breaker) == 0
+
+
+def test_bad_gateway_on_every_attempt_gives_up(delivery_state):
+    api = FakeBotApi(*[BAD_GATEWAY] * main.SEND_MAX_ATTEMPTS)
+
+    assert not api.deliver()
+    assert len(api.calls) == main.SEND_MAX_ATTEMPTS
+    assert len(delivery_state) == main.SEND_MAX_ATTEMPTS - 1
+    assert all(0 <= delay <= 0.02 for delay in delivery_state)
+    assert len(main.dead_letters) == 1
+    assert last_reason() == "gave up: Bad Gateway"
+
+
+def test_outages_do_not_open_breaker():
+    for _ in range(main.CIRCUIT_FAILURE_THRESHOLD + 1):
+        FakeBotApi(*[BAD_GATEWAY] * main.SEND_MAX_ATTEMPTS).deliver()
+        FakeBotApi(httpx.ReadTimeout).deliver()
+        FakeBotApi(EMPTY_TEXT).deliver()
+
+    assert len(main.recipient_breaker) == 0
+
+    api = FakeBotApi()
+    assert api.deliver()
+    assert len(api.calls) == 1
+
+
+def test_repeated_recipient_errors_open_breaker():
+    for _ in range(main.CIRCUIT_FAILURE_THRESHOLD):
+        FakeBotApi(CHAT_NOT_FOUND).deliver()
+
+    assert main.recipient_breaker.is_open(CHAT_ID)
+
+
+def test_breaker_prunes_stale_entries(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(main.time, "monotonic", lambda: clock[0])
+    breaker = main.CircuitBreaker(threshold=2, cooldown=60)
+
+    breaker.trip(1)
+    breaker.record_failure(2)
+    assert len(breaker) == 2
+
+    clock[0] += 61
+    assert breaker.allow(3)
+    assert len(breaker) == 0
+
+
+def make_open_game(chat_id: int = -1) -> main.Game:
+    game = main.Game()
+    game.add_player(main.Player(1, "a"))
+    game.add_player(main.Player(2, "b"))
+    game.state = main.GameState.BIDDING
+    main.open_game(chat_id, game)
+    return game
+
+
+def test_undelivered_bidding_prompt_is_reposted_then_table_closed(delivery_state):
+    game = make_open_game()
+    api = FakeBotApi(*[CHAT_NOT_FOUND] * 20)
+
+    api.run(lambda context: main.post_bidding_prompt(context, game))
+
+    prompts = [call for call in api.calls if call["chat_id"] == game.chat_id]
+    assert len(prompts) == main.BIDDING_PROMPT_ATTEMPTS
+    assert delivery_state.count(main.BIDDING_PROMPT_RETRY_DELAY) == main.BIDDING_PROMPT_ATTEMPTS - 1
+    assert not game.is_open
+    assert {call["chat_id"] for call in api.calls} == {game.chat_id, 1, 2}
+
+
+def test_reposted_prompt_succeeds():
+    game = make_open_game()
+    api = FakeBotApi(*[BAD_GATEWAY] * main.SEND_MAX_ATTEMPTS)
+
+    api.run(lambda context: main.post_bidding_prompt(context, game))
+
+    assert game.is_open
+    assert len(api.calls) == main.SEND_MAX_ATTEMPTS + 1
+    assert api.calls[-1]["text"].startswith("🎲 Ход a")
+    main.close_game(game.chat_id)
+
+
+def test_stale_prompt_is_not_reposted():
+    game = make_open_game()
+    api = FakeBotApi(EMPTY_TEXT)
+
+    async def prompt_then_move_on(context):
+        await main.post_bidding_prompt(context, game)
+        game.prompt_seq += 1  # игрок уже сделал ход, появилось новое приглашение
+
+    api.run(prompt_then_move_on)
+
+    assert len(api.calls) == 1
+    assert game.is_open
+    main.close_game(game.chat_id)
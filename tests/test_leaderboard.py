@@ -0,0 +1,53 @@
+import main
+
+
+def make_players(count: int):
+    return [main.Player(user_id, f"Player {user_id}") for user_id in range(1, count + 1)]
+
+
+def test_tied_players_share_a_place():
+    leaderboard = main.Leaderboard()
+    players = make_players(4)
+    for player in players:
+        leaderboard.register(player)
+
+    leaderboard.record_result(players[1], 50, won=True)
+    leaderboard.record_result(players[2], 50, won=True)
+
+    assert [profile.user_id for profile in leaderboard.top(2)] == [2, 3]
+    assert leaderboard.rank(2) == leaderboard.rank(3) == 1
+    assert leaderboard.rank(1) == leaderboard.rank(4) == 3
+    assert leaderboard.rank(99) is None
+
+
+def test_record_result_reranks_player():
+    leaderboard = main.Leaderboard()
+    players = make_players(3)
+    leaderboard.record_result(players[0], 100, won=True)
+    leaderboard.record_result(players[1], 30, won=True)
+    leaderboard.register(players[2])
+
+    leaderboard.record_result(players[2], 200, won=True)
+    leaderboard.record_result(players[0], -120)
+
+    assert [profile.user_id for profile in leaderboard.top()] == [3, 2, 1]
+    assert leaderboard.rank(1) == 3
+    assert leaderboard.profiles[1].net_winnings == -20
+    assert leaderboard.profiles[1].wins == 1
+
+
+def test_record_round_uses_net_gain():
+    leaderboard = main.Leaderboard()
+    game = main.Game()
+    winner, loser = make_players(2)
+    game.add_player(winner)
+    game.add_player(loser)
+    winner.bet(30)
+    loser.bet(50)
+
+    leaderboard.record_round(game, winner, 80)
+
+    assert leaderboard.profiles[winner.user_id].net_winnings == 50
+    assert leaderboard.profiles[loser.user_id].net_winnings == -50
+    assert leaderboard.profiles[loser.user_id].wins == 0
+    assert leaderboard.rank(winner.user_id) == 1
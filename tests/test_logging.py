@@ -0,0 +1,108 @@
+import logging
+import sys
+
+import pytest
+
+import main
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(main.time, "monotonic", lambda: now[0])
+    return now
+
+
+def make_record(msg: str, *args, chat_id=None, level=logging.WARNING, exc_info=None) -> logging.LogRecord:
+    record = logging.LogRecord("main.dead_letter", level, __file__, 1, msg, args, exc_info)
+    record.chat_id = chat_id
+    return record
+
+
+def test_same_failure_across_chats_is_suppressed(clock):
+    reported = []
+    log_filter = main.DuplicateFilter(window=10)
+    log_filter.sink = reported.append
+
+    assert log_filter.filter(make_record("Message dropped: %s", "gave up: Bad Gateway", chat_id=1))
+    for chat_id in (2, 3, 3):
+        assert not log_filter.filter(make_record("Message dropped: %s", "gave up: Bad Gateway", chat_id=chat_id))
+    log_filter.flush()
+
+    assert log_filter.suppressed_total == 3
+    assert len(reported) == 1
+    assert reported[0].getMessage() == "Message dropped: gave up: Bad Gateway"
+    assert (reported[0].suppressed, reported[0].chats) == (3, 3)
+    assert reported[0].chat_id is None
+
+
+def test_different_reasons_are_not_duplicates(clock):
+    log_filter = main.DuplicateFilter(window=10)
+
+    assert log_filter.filter(make_record("Message dropped: %s", "forbidden", chat_id=1))
+    assert log_filter.filter(make_record("Message dropped: %s", "circuit open", chat_id=1))
+
+
+def test_info_records_are_never_suppressed(clock):
+    log_filter = main.DuplicateFilter(window=10)
+
+    assert all(log_filter.filter(make_record("tick", level=logging.INFO)) for _ in range(3))
+
+
+def test_expired_keys_are_pruned_and_reported(clock):
+    reported = []
+    log_filter = main.DuplicateFilter(window=10)
+    log_filter.sink = reported.append
+
+    for _ in range(4):
+        log_filter.filter(make_record("Send failed (%s)", "TimedOut", chat_id=1))
+    clock[0] += 11
+    log_filter.filter(make_record("unrelated", level=logging.INFO))
+
+    assert len(log_filter._entries) == 0  # pylint: disable=protected-access
+    assert len(reported) == 1
+    assert reported[0].getMessage() == "Send failed (TimedOut)"
+    assert (reported[0].suppressed, reported[0].chats) == (3, 1)
+    assert reported[0].chat_id == 1
+
+
+def test_repeat_after_window_passes_and_reports_previous_window(clock):
+    reported = []
+    log_filter = main.DuplicateFilter(window=10)
+    log_filter.sink = reported.append
+
+    log_filter.filter(make_record("boom"))
+    log_filter.filter(make_record("boom"))
+    clock[0] += 5
+    log_filter.filter(make_record("other"))
+    clock[0] += 6
+
+    assert log_filter.filter(make_record("boom"))
+    assert [record.suppressed for record in reported] == [1]
+
+
+def test_full_table_suppresses_new_keys(clock):
+    reported = []
+    log_filter = main.DuplicateFilter(window=10, max_keys=2)
+    log_filter.sink = reported.append
+
+    results = [log_filter.filter(make_record(f"error {i}")) for i in range(5)]
+    log_filter.flush()
+
+    assert results == [True, True, False, False, False]
+    assert len(log_filter._entries) == 0  # pylint: disable=protected-access
+    assert [record.suppressed for record in reported] == [3]
+
+
+def test_entries_do_not_keep_exc_info(clock):
+    log_filter = main.DuplicateFilter(window=10)
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        record = make_record("failed", exc_info=sys.exc_info())
+
+    log_filter.filter(record)
+
+    entry = next(iter(log_filter._entries.values()))  # pylint: disable=protected-access
+    assert "exc_info" not in entry[2]
+    assert not any(isinstance(value, logging.LogRecord) for value in entry)
@@ -0,0 +1,89 @@
+import asyncio
+
+import httpx
+import pytest
+from telegram.error import TimedOut
+
+import main
+
+
+@pytest.fixture(autouse=True)
+def fresh_stats(monkeypatch):
+    monkeypatch.setattr(main, "live_stats", main.LiveStats())
+
+
+def run_requests(handler, count: int):
+    request = main.InstrumentedRequest(httpx_kwargs={"transport": httpx.MockTransport(handler)})
+
+    async def run():
+        await request.initialize()
+        try:
+            for _ in range(count):
+                try:
+                    await request.do_request("https://api.telegram.org/bot1:x/sendMessage", "POST")
+                except TimedOut:
+                    pass
+        finally:
+            await request.shutdown()
+
+    asyncio.run(run())
+
+
+def error_totals() -> dict:
+    return {kind: counter.total() for kind, counter in main.live_stats.api_errors.items()}
+
+
+def test_instrumented_request_counts_every_api_call():
+    responses = iter([200, 403, 429, 200])
+    run_requests(lambda request: httpx.Response(next(responses), json={}), 4)
+
+    assert main.live_stats.api_requests.total() == 4
+    assert error_totals() == {"HTTP 403": 1, "HTTP 429": 1}
+
+
+def test_instrumented_request_counts_transport_errors():
+    def handler(request):
+        raise httpx.ConnectTimeout("connect", request=request)
+
+    run_requests(handler, 2)
+
+    assert main.live_stats.api_requests.total() == 2
+    assert error_totals() == {"TimedOut": 2}
+
+
+def test_rolling_counter_forgets_old_buckets():
+    counter = main.RollingCounter(window=60, bucket_seconds=10)
+    counter.add(5, now=0)
+    counter.add(2, now=55)
+
+    assert counter.total(now=59) == 7
+    assert counter.total(now=65) == 2
+    assert counter.total(now=200) == 0
+
+
+def test_closed_game_no_longer_changes_table_counts():
+    game = main.Game()
+    game.add_player(main.Player(1, "a"))
+    assert sum(main.live_stats.tables_by_state.values()) == 0
+    assert main.live_stats.players_online == 0
+
+    main.open_game(-1, game)
+    game.add_player(main.Player(2, "b"))
+    game.state = main.GameState.BIDDING
+    assert main.live_stats.tables_by_state[main.GameState.BIDDING] == 1
+    assert main.live_stats.players_online == 2
+
+    main.close_game(-1)
+    game.state = main.GameState.WAITING_FOR_PLAYERS
+    game.remove_player(1)
+    assert all(count == 0 for count in main.live_stats.tables_by_state.values())
+    assert main.live_stats.players_online == 0
+
+
+def test_window_covers_only_time_since_start():
+    stats = main.live_stats
+    start = stats.started_at
+
+    assert stats.window_seconds(now=start) == main.STATS_BUCKET_SECONDS
+    assert stats.window_seconds(now=start + 60) == 60
+    assert stats.window_seconds(now=start + 10 * main.STATS_WINDOW) == main.STATS_WINDOW